@@ -0,0 +1,47 @@
+"""
+GUI-free core of the application: bots configuration, geometry helpers and constants.
+
+Nothing heavy is imported here. Public names are resolved on first access through
+the module level __getattr__, so `import core` is cheap and numpy is only loaded
+when configuration file I/O actually happens.
+"""
+
+import importlib
+
+
+_LAZY_ATTRIBUTES = {
+    'Configuration': 'core.configuration',
+    'ConfigurationJournal': 'core.journal',
+    'ConfigurationDiff': 'core.diff',
+    'iterFrameDiffs': 'core.diff',
+    'iterFrameFiles': 'core.diff',
+    'ConfigurationOptimizer': 'core.optimizer',
+    'Objective': 'core.optimizer',
+    'parseObjective': 'core.optimizer',
+    'registerOrderParameter': 'core.order_parameters',
+    'getOrderParameter': 'core.order_parameters',
+    'registerOrderParameterScript': 'core.order_parameters',
+    'unregisterOrderParameter': 'core.order_parameters',
+    'calcTangentPoints': 'core.geometry',
+    'sumPoints': 'core.geometry',
+    'getDistance': 'core.geometry',
+    'BOT_REAR_RADIUS': 'core.constants',
+    'BOT_NOSE_ANGLE': 'core.constants',
+    'BOT_LENGTH': 'core.constants',
+    'DEG2RAD': 'core.constants',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,137 @@
+"""
+Headless entry point.
+
+    python -m core info <config.npy>
+    python -m core optimize <input.npy> <output.npy> --objective 'polar=0.8' [--iterations N]
+    python -m core diff <frame1.npy> <frame2.npy> [<frame3.npy> ...] [--dt SECONDS]
+    python -m core importtime [--budget SECONDS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+#maximal allowed time of `import core.configuration` on top of bare interpreter startup
+IMPORT_TIME_BUDGET = 0.05
+
+#directory containing the core package, fresh interpreters are started there
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def measureImportTime(statement='import core.configuration', repeats=5):
+    """
+    :param statement: Python statement to time in a fresh interpreter
+    :param repeats: Number of runs, the best one is taken
+    :return: Best time in seconds spent on the statement above bare interpreter startup
+    """
+
+    def bestRunTime(code):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True, cwd=REPOSITORY_DIRECTORY)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    return max(bestRunTime(statement) - bestRunTime('pass'), 0.0)
+
+
+def runInfo(args):
+    from core.configuration import Configuration
+
+    config = Configuration()
+    config.LoadConfiguration(args.filename)
+    print(f'Bots number: {config.GetBotsNumber()}')
+    for bot in config.GetBotsPositions():
+        print(f'{bot[0]}\t{bot[1]}\t{bot[2][0]}, {bot[2][1]}')
+    return 0
+
+
+def runOptimize(args):
+    from core.configuration import Configuration
+    from core.optimizer import ConfigurationOptimizer, parseObjective
+
+    try:
+        objective = parseObjective(args.objective, overlap_weight=args.overlap_weight)
+    except (ValueError, KeyError) as error:
+        args.parser.error(f'bad --objective: {error.args[0]}')
+
+    config = Configuration()
+    config.LoadConfiguration(args.input)
+    optimizer = ConfigurationOptimizer(objective, seed=args.seed)
+
+    def printProgress(iteration, iterations, value):
+        print(f'{iteration}/{iterations}\t{value:.6f}', file=sys.stderr)
+
+    optimized, value = optimizer.Run(config.GetBotsPositions(), iterations=args.iterations,
+                                     progress_callback=printProgress, progress_every=100)
+    config.SetBotsPositions(optimized)
+    config.SaveConfiguration(args.output)
+    print(value)
+    return 0
+
+
+def positiveFloat(text):
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f'should be a positive number, got {text}')
+    return value
+
+
+def runDiff(args):
+    if len(args.filenames) < 2:
+        args.parser.error('at least two frames are required')
+
+    from core.diff import iterFrameDiffs, iterFrameFiles
+
+    print('frame\tmatched\tadded\tremoved\tmsd\tmsr\tD\tD_r')
+    for index, diff in enumerate(iterFrameDiffs(iterFrameFiles(args.filenames), dt=args.dt), start=1):
+        summary = diff.Summary()
+        print(f'{index}\t{summary["matched"]}\t{summary["added"]}\t{summary["removed"]}\t'
+              f'{summary["msd"]:.6g}\t{summary["msr"]:.6g}\t'
+              f'{summary["translational_diffusion"]:.6g}\t{summary["rotational_diffusion"]:.6g}')
+    return 0
+
+
+def runImportTime(args):
+    elapsed = measureImportTime()
+    print(f'import core.configuration: {elapsed * 1000:.1f} ms (budget {args.budget * 1000:.1f} ms)')
+    return 0 if elapsed <= args.budget else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m core')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help='print bots of a saved configuration')
+    info_parser.add_argument('filename')
+    info_parser.set_defaults(handler=runInfo)
+
+    optimize_parser = subparsers.add_parser('optimize', help='optimize configuration towards target order parameters')
+    optimize_parser.add_argument('input')
+    optimize_parser.add_argument('output')
+    optimize_parser.add_argument('--objective', required=True, help="e.g. 'polar=0.8, nematic=0.2*0.5'")
+    optimize_parser.add_argument('--iterations', type=int, default=5000)
+    optimize_parser.add_argument('--overlap-weight', type=float, default=10.0)
+    optimize_parser.add_argument('--seed', type=int, default=None)
+    optimize_parser.set_defaults(handler=runOptimize, parser=optimize_parser)
+
+    diff_parser = subparsers.add_parser('diff', help='displacement statistics between consecutive saved frames')
+    diff_parser.add_argument('filenames', nargs='+')
+    diff_parser.add_argument('--dt', type=positiveFloat, default=1.0, help='time between consecutive frames')
+    diff_parser.set_defaults(handler=runDiff, parser=diff_parser)
+
+    import_time_parser = subparsers.add_parser('importtime', help='check import time of the core against a budget')
+    import_time_parser.add_argument('--budget', type=float, default=IMPORT_TIME_BUDGET)
+    import_time_parser.set_defaults(handler=runImportTime)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+from core.geometry import sumPoints
+
+
+'''Bots configuration part'''
+
+
+class Configuration():
+    def __init__(self):
+        self.bots_positions = []
+        self.used_ids = [False for i in range(1000)]
+        self.listeners = []
+
+    def AddListener(self, listener):
+        """
+        :param listener: Callable taking operation name and its arguments
+
+        Listener is called after every change of the configuration with one of
+            ('add', identifier, angle, center)
+            ('edit', identifier, angle, pos, *extra_fields)
+            ('delete', identifier)
+            ('reset', bots_positions)
+        Edit carries the whole row, fields stored after the position included
+        Edit and reset always carry absolute values, so replaying them twice is harmless
+        """
+        self.listeners.append(listener)
+
+    def RemoveListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def GetBotsPositions(self):
+        return self.bots_positions
+
+    def GetBotsNumber(self):
+        return len(self.bots_positions)
+
+    def GetUsedIds(self):
+        return self.used_ids
+
+    def GetBotPosById(self, identifier):
+        for i in range(len(self.bots_positions)):
+            if self.bots_positions[i][0] == identifier:
+                return self.bots_positions[i][1], self.bots_positions[i][2]
+
+    def EditBot(self, identifier, angle=None, pos=None):
+        if angle is None and pos is None:
+            return
+
+        for i in range(len(self.bots_positions)):
+            if self.bots_positions[i][0] == identifier:
+                if angle is not None:
+                    self.bots_positions[i][1] = angle
+                if pos is not None:
+                    self.bots_positions[i][2] = pos
+                self._notify('edit', *self.bots_positions[i])
+                return
+
+    def MoveBot(self, identifier, delta_angle=None, delta_pos=None):
+        if delta_angle is None and delta_pos is None:
+            return
+
+        for i in range(len(self.bots_positions)):
+            if self.bots_positions[i][0] == identifier:
+                if delta_angle is not None:
+                    self.bots_positions[i][1] += delta_angle
+                if delta_pos is not None:
+                    self.bots_positions[i][2] = sumPoints(self.bots_positions[i][2], delta_pos, scale=1)
+                self._notify('edit', *self.bots_positions[i])
+                return
+
+    def DeleteBot(self, identifier):
+        if identifier is None:
+            return
+        for i in range(len(self.bots_positions)):
+            if self.bots_positions[i][0] == identifier:
+                self.bots_positions.remove(self.bots_positions[i])
+                self._setUsedId(identifier, False)
+                self._notify('delete', identifier)
+                return
+
+    def LoadConfiguration(self, filename):
+        # numpy is only needed for file I/O, so it is imported on first use
+        import numpy as np
+        self.SetBotsPositions(np.load(filename, allow_pickle=True).tolist())
+
+    def SaveConfiguration(self, filename):
+        import numpy as np
+        np.save(filename, np.array(self.bots_positions, dtype=object), allow_pickle=True)
+
+    def AddBot(self, identifier, angle, center):
+        if not self.used_ids[identifier]:
+            self.bots_positions.append([identifier, angle, center])
+            self.used_ids[identifier] = True
+            self._notify('add', identifier, angle, center)
+
+    def SetBotsPositions(self, bots_positions):
+        self.bots_positions = [list(bot) for bot in bots_positions]
+        self.used_ids = [False for i in range(1000)]
+        for bot in self.bots_positions:
+            self._setUsedId(bot[0], True)
+        self._notify('reset', self.CopyBotsPositions())
+
+    def CopyBotsPositions(self):
+        # rows may carry extra fields after the position, they are kept as is
+        return [[bot[0], bot[1], tuple(bot[2])] + list(bot[3:]) for bot in self.bots_positions]
+
+    def ClearConfiguration(self):
+        self.SetBotsPositions([])
+
+    def _setUsedId(self, identifier, used):
+        # loaded files may hold ids which are not list indices, they are just not tracked
+        try:
+            index = int(identifier)
+        except (TypeError, ValueError):
+            return
+        if index != identifier or index < 0:
+            return
+        if index >= len(self.used_ids):
+            if not used:
+                return
+            self.used_ids.extend(False for i in range(index + 1 - len(self.used_ids)))
+        self.used_ids[index] = used
+
+    def _notify(self, operation, *args):
+        for listener in self.listeners:
+            listener(operation, *args)
@@ -0,0 +1,12 @@
+import math
+
+
+'''Bot shape constants'''
+
+#bot shape parameters
+BOT_REAR_RADIUS = 2.5
+BOT_NOSE_ANGLE = math.pi / 8
+BOT_LENGTH = BOT_REAR_RADIUS + BOT_REAR_RADIUS / math.sin(BOT_NOSE_ANGLE)
+
+#math constants
+DEG2RAD = math.pi / 180
@@ -0,0 +1,118 @@
+import numpy as np
+
+from core.constants import DEG2RAD
+
+
+'''Configuration diff'''
+
+
+class ConfigurationDiff():
+    """
+    Displacement and rotation fields between two configurations, bots are matched by identifier
+    """
+
+    def __init__(self, before, after, dt=1.0):
+        """
+        :param before: Bots positions of the first configuration in Configuration format
+        :param after: Bots positions of the second configuration in Configuration format
+        :param dt: Time between configurations, used for diffusion coefficients, should be positive
+        """
+
+        if not dt > 0:
+            raise ValueError(f'dt should be a positive number, got {dt}')
+        self.dt = dt
+
+        #identifier -> index in before, so matching is a single pass over after
+        before_index = {bot[0]: i for i, bot in enumerate(before)}
+        after_ids = {bot[0] for bot in after}
+        matched = [(before_index[bot[0]], j) for j, bot in enumerate(after) if bot[0] in before_index]
+
+        self.identifiers = [after[j][0] for _, j in matched]
+        self.added_ids = [bot[0] for bot in after if bot[0] not in before_index]
+        self.removed_ids = [bot[0] for bot in before if bot[0] not in after_ids]
+
+        before_indices = [i for i, _ in matched]
+        after_indices = [j for _, j in matched]
+        before_angles, before_positions = _toArrays(before)
+        after_angles, after_positions = _toArrays(after)
+
+        self.start_positions = before_positions[before_indices]
+        self.end_positions = after_positions[after_indices]
+        self.displacements = self.end_positions - self.start_positions
+        #rotations in degrees wrapped into [-180, 180)
+        self.rotations = np.mod(after_angles[after_indices] - before_angles[before_indices] + 180, 360) - 180
+
+    def GetMatchedNumber(self):
+        return len(self.identifiers)
+
+    def GetDisplacementLengths(self):
+        return np.sqrt((self.displacements ** 2).sum(axis=1))
+
+    def MeanSquaredDisplacement(self):
+        if not self.identifiers:
+            return 0.0
+        return float((self.displacements ** 2).sum(axis=1).mean())
+
+    def MeanSquaredRotation(self):
+        """
+        :return: Mean squared rotation in radians squared
+        """
+        if not self.identifiers:
+            return 0.0
+        return float(((self.rotations * DEG2RAD) ** 2).mean())
+
+    def TranslationalDiffusion(self):
+        """
+        :return: Estimate of D from MSD = 4 D dt in two dimensions
+        """
+        return self.MeanSquaredDisplacement() / (4 * self.dt)
+
+    def RotationalDiffusion(self):
+        """
+        :return: Estimate of D_r from <dtheta^2> = 2 D_r dt, in radians squared per time unit
+        """
+        return self.MeanSquaredRotation() / (2 * self.dt)
+
+    def Summary(self):
+        return {
+            'matched': self.GetMatchedNumber(),
+            'added': len(self.added_ids),
+            'removed': len(self.removed_ids),
+            'msd': self.MeanSquaredDisplacement(),
+            'msr': self.MeanSquaredRotation(),
+            'translational_diffusion': self.TranslationalDiffusion(),
+            'rotational_diffusion': self.RotationalDiffusion(),
+        }
+
+
+def iterFrameDiffs(frames, dt=1.0):
+    """
+    :param frames: Iterable of bots positions in Configuration format, e.g. iterFrameFiles(filenames)
+    :param dt: Time between consecutive frames
+    :return: Generator of ConfigurationDiff between consecutive frames
+
+    Only the previous frame is kept in memory, so recordings of any length can be streamed
+    """
+
+    if not dt > 0:
+        raise ValueError(f'dt should be a positive number, got {dt}')
+    previous = None
+    for frame in frames:
+        if previous is not None:
+            yield ConfigurationDiff(previous, frame, dt=dt)
+        previous = frame
+
+
+def iterFrameFiles(filenames):
+    """
+    :param filenames: Iterable of .npy files saved by Configuration.SaveConfiguration
+    :return: Generator of bots positions, files are loaded one by one
+    """
+    for filename in filenames:
+        yield np.load(filename, allow_pickle=True).tolist()
+
+
+def _toArrays(bots_positions):
+    angles = np.array([bot[1] for bot in bots_positions], dtype=float)
+    positions = np.array([bot[2] for bot in bots_positions], dtype=float).reshape(-1, 2)
+    return angles, positions
@@ -0,0 +1,40 @@
+'''Useful functions'''
+
+
+def calcTangentPoints(c: float, r: float, p: float, eps: float = 1E-9) -> tuple:
+    """
+    :param c: X-axis coordinate of circle center
+    :param r: Circle radius
+    :param p: X-axis coordinate of outer point
+    :return: Tangent points in ((X, Y), (X, Y)) format
+    :param eps: Threshold to consume two numbers equiv
+
+    Calculate coordinates of intersection of tangents from outer points to circle. Return one or two
+    points depending on point position
+    """
+
+    if r < 0:
+        non_negative_error = ValueError('r should be a positive number')
+        raise non_negative_error
+
+    if abs(p - c) < r:
+        return ()
+
+    if abs(abs(p - c) - r) <= eps:
+        return p, 0
+
+    x = (r**2 - c**2 + c * p) / (p - c)
+    y = (r**2 - (x - c)**2)**0.5
+    return (x, y), (x, -y)
+
+def sumPoints(p1, p2, scale):
+    return (p1[0] + scale * p2[0],
+            p1[1] + scale * p2[1])
+
+def getDistance(p1, p2):
+    """
+    :param p1: First point in (X, Y) format
+    :param p2: Second point in (X, Y) format
+    :return: Euclidean distance between given points
+    """
+    return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
@@ -0,0 +1,318 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+'''Autosave journal'''
+
+JOURNAL_FILENAME = 'journal.jsonl'
+SNAPSHOT_FILENAME = 'snapshot.json'
+
+#snapshot is written when either limit is reached and there are unsaved records
+DEFAULT_SNAPSHOT_EVERY_RECORDS = 500
+DEFAULT_SNAPSHOT_INTERVAL = 30.0
+
+
+class ConfigurationJournal():
+    """
+    Append-only journal of configuration edits written by a background thread.
+
+    Records come from Configuration listeners and are only queued on the calling thread,
+    all disk I/O happens on the writer thread. The writer keeps its own copy of the
+    configuration, periodically dumps it into a compact snapshot and truncates the journal.
+    Recover() restores the last state from the snapshot and the journal tail.
+    """
+
+    def __init__(self, directory, snapshot_every_records=DEFAULT_SNAPSHOT_EVERY_RECORDS,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, error_callback=None):
+        """
+        :param error_callback: Called from the writer thread with the exception when journaling fails,
+            after that edits are no longer journaled but saves and Close still work
+        """
+
+        self.directory = directory
+        self.journal_filename = os.path.join(directory, JOURNAL_FILENAME)
+        self.snapshot_filename = os.path.join(directory, SNAPSHOT_FILENAME)
+        self.snapshot_every_records = snapshot_every_records
+        self.snapshot_interval = snapshot_interval
+        self.error_callback = error_callback
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.bots = {}
+        self.error = None
+
+    def Recover(self):
+        """
+        :return: Bots positions stored by the previous session or None if there is nothing to recover
+
+        Raises IOError if autosave files cannot be read and ValueError if they are corrupt,
+        MoveAside() keeps such files out of the way of the next session
+        """
+
+        if not os.path.exists(self.snapshot_filename) and not os.path.exists(self.journal_filename):
+            return None
+
+        try:
+            bots = {}
+            if os.path.exists(self.snapshot_filename):
+                with open(self.snapshot_filename, 'r') as snapshot_file:
+                    bots = self._botsFromPositions(json.load(snapshot_file))
+
+            if os.path.exists(self.journal_filename):
+                with open(self.journal_filename, 'r') as journal_file:
+                    for line in journal_file:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            #last line may be torn by a crash in the middle of writing
+                            break
+                        self._applyRecord(bots, record)
+
+            bots_positions = self._positionsFromBots(bots)
+            for bot in bots_positions:
+                self._validateBot(bot)
+        except (TypeError, IndexError, KeyError, AttributeError) as error:
+            raise ValueError(f'Corrupt autosave in {self.directory}: {error!r}') from error
+        return bots_positions
+
+    def MoveAside(self):
+        """
+        Rename autosave files which cannot be recovered, so they neither block the next start nor get lost
+        """
+        for filename in (self.journal_filename, self.snapshot_filename):
+            if os.path.exists(filename):
+                try:
+                    os.replace(filename, filename + '.bad')
+                except OSError:
+                    os.remove(filename)
+
+    def Start(self, bots_positions=()):
+        """
+        :param bots_positions: Current state of configuration, it becomes the first snapshot
+        """
+
+        if self.thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.bots = self._botsFromPositions(bots_positions)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='ConfigurationJournal', daemon=True)
+        self.thread.start()
+
+    def Close(self, discard=False):
+        """
+        :param discard: Remove journal and snapshot after the last record is written
+
+        Blocks until the writer thread has handled everything queued before
+        """
+
+        if self.thread is None:
+            return
+        self.queue.put(('close', discard))
+        self.thread.join()
+        self.thread = None
+
+    def Record(self, operation, *args):
+        """
+        Configuration listener, only puts the record into the writer queue
+        """
+        if self.error is not None:
+            return
+        self.queue.put(('record', [operation] + list(args)))
+
+    def SaveAsync(self, filename, bots_positions, callback=None):
+        """
+        :param filename: Target .npy file
+        :param bots_positions: Bots positions to save, copied before returning
+        :param callback: Called from the writer thread with None or the raised exception
+
+        Save configuration in the same format as Configuration.SaveConfiguration without blocking the caller
+        """
+        #rows are saved unchanged, as Configuration.SaveConfiguration does
+        bots_positions = [[bot[0], bot[1], tuple(bot[2])] + list(bot[3:]) for bot in bots_positions]
+        self.queue.put(('save', (filename, bots_positions, callback)))
+
+    def _run(self):
+        journal_file = None
+        try:
+            self._writeSnapshot()
+            journal_file = open(self.journal_filename, 'w')
+        except Exception as error:
+            journal_file = self._fail(error, journal_file)
+        records_since_snapshot = 0
+        last_snapshot_time = time.monotonic()
+
+        while True:
+            timeout = max(self.snapshot_interval - (time.monotonic() - last_snapshot_time), 0.1)
+            try:
+                items = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = None
+            for kind, payload in items:
+                if kind == 'record' and self.error is None:
+                    try:
+                        record = self._serializeRecord(payload)
+                        journal_file.write(json.dumps(record) + '\n')
+                        self._applyRecord(self.bots, record)
+                        records_since_snapshot += 1
+                    except Exception as error:
+                        journal_file = self._fail(error, journal_file)
+                elif kind == 'save':
+                    self._save(*payload)
+                elif kind == 'close':
+                    closing = payload
+
+            if self.error is None:
+                try:
+                    if items:
+                        journal_file.flush()
+                        os.fsync(journal_file.fileno())
+
+                    snapshot_due = (records_since_snapshot >= self.snapshot_every_records
+                                    or time.monotonic() - last_snapshot_time >= self.snapshot_interval)
+                    if closing is not None or (records_since_snapshot and snapshot_due):
+                        self._writeSnapshot()
+                        #records are absolute, so a crash before truncation only replays them once more
+                        journal_file.close()
+                        journal_file = open(self.journal_filename, 'w')
+                        records_since_snapshot = 0
+                        last_snapshot_time = time.monotonic()
+                    elif snapshot_due:
+                        last_snapshot_time = time.monotonic()
+                except Exception as error:
+                    journal_file = self._fail(error, journal_file)
+
+            if closing is not None:
+                if journal_file is not None:
+                    journal_file.close()
+                if closing:
+                    for filename in (self.journal_filename, self.snapshot_filename):
+                        try:
+                            if os.path.exists(filename):
+                                os.remove(filename)
+                        except OSError as error:
+                            self._report(error)
+                return
+
+    def _fail(self, error, journal_file):
+        """
+        Stop journaling after an unrecoverable error and report it, return the closed journal file
+        """
+        self.error = error
+        if journal_file is not None:
+            try:
+                journal_file.close()
+            except Exception:
+                pass
+        self._report(error)
+        return None
+
+    def _report(self, error):
+        if self.error_callback is not None:
+            self.error_callback(error)
+
+    def _writeSnapshot(self):
+        temp_filename = self.snapshot_filename + '.tmp'
+        with open(temp_filename, 'w') as snapshot_file:
+            json.dump([self._serializeBot(bot) for bot in self.bots.values()], snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_filename, self.snapshot_filename)
+
+    def _save(self, filename, bots_positions, callback):
+        error = None
+        try:
+            import numpy as np
+            np.save(filename, np.array(bots_positions, dtype=object), allow_pickle=True)
+        except Exception as e:
+            error = e
+        if callback is not None:
+            callback(error)
+
+    @staticmethod
+    def _applyRecord(bots, record):
+        operation = record[0]
+        if operation == 'add':
+            bot = ConfigurationJournal._copyBot(record[1:])
+            if bot[0] not in bots:
+                bots[bot[0]] = bot
+        elif operation == 'edit':
+            #edit carries the whole row including extra fields
+            bot = ConfigurationJournal._copyBot(record[1:])
+            if bot[0] in bots:
+                bots[bot[0]] = bot
+        elif operation == 'delete':
+            bots.pop(_identifier(record[1]), None)
+        elif operation == 'reset':
+            bots.clear()
+            bots.update(ConfigurationJournal._botsFromPositions(record[1]))
+
+    @staticmethod
+    def _serializeRecord(record):
+        """
+        Convert record into plain JSON types, numpy scalars of loaded configurations included
+        """
+        operation = record[0]
+        if operation in ('add', 'edit'):
+            return [operation] + ConfigurationJournal._serializeBot(record[1:])
+        if operation == 'delete':
+            return [operation, _identifier(record[1])]
+        if operation == 'reset':
+            return [operation, [ConfigurationJournal._serializeBot(bot) for bot in record[1]]]
+        raise ValueError(f'Unknown journal operation {operation!r}')
+
+    @staticmethod
+    def _serializeBot(bot):
+        return ([_identifier(bot[0]), float(bot[1]), [float(bot[2][0]), float(bot[2][1])]]
+                + [_toPlain(value) for value in bot[3:]])
+
+    @staticmethod
+    def _copyBot(bot):
+        return [_identifier(bot[0]), bot[1], tuple(bot[2])] + list(bot[3:])
+
+    @staticmethod
+    def _validateBot(bot):
+        if len(bot[2]) != 2:
+            raise ValueError(f'Bot {bot[0]!r} position should have two coordinates, got {bot[2]!r}')
+        for value in (bot[1],) + tuple(bot[2]):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'Bot {bot[0]!r} has non-numeric angle or position {value!r}')
+
+    @staticmethod
+    def _botsFromPositions(bots_positions):
+        bots = {}
+        for bot in bots_positions:
+            bot = ConfigurationJournal._copyBot(bot)
+            bots[bot[0]] = bot
+        return bots
+
+    @staticmethod
+    def _positionsFromBots(bots):
+        return [ConfigurationJournal._copyBot(bot) for bot in bots.values()]
+
+
+def _identifier(value):
+    #integral ids become int, so ids journaled as JSON numbers index used_ids after recovery
+    value = _toPlain(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _toPlain(value):
+    if isinstance(value, (list, tuple)):
+        return [_toPlain(item) for item in value]
+    if hasattr(value, 'item'):
+        #numpy scalar
+        return value.item()
+    return value
@@ -0,0 +1,228 @@
+import numpy as np
+
+from core.order_parameters import OverlapTracker, getOrderParameter, gridOverlapPenalty, overlapPenalty
+
+
+'''Configuration optimizer'''
+
+DEFAULT_OVERLAP_WEIGHT = 10.0
+
+
+class Objective():
+    """
+    Weighted sum of squared deviations of order parameters from their targets plus overlap penalty
+    """
+
+    def __init__(self, targets, overlap_weight=DEFAULT_OVERLAP_WEIGHT):
+        """
+        :param targets: Dictionary name -> (target, weight) of registered order parameters
+        :param overlap_weight: Weight of overlap penalty, 0 allows overlaps
+        """
+
+        self.targets = {name: (float(target), float(weight)) for name, (target, weight) in targets.items()}
+        self.parameters = {name: getOrderParameter(name) for name in self.targets}
+        self.overlap_weight = overlap_weight
+
+    def __call__(self, angles, positions):
+        """
+        :param angles: Bots angles in degrees with shape (batch, bots)
+        :param positions: Bots positions with shape (batch, bots, 2)
+        :return: Objective values with shape (batch,)
+        """
+
+        values = self.OrderTerm(angles, positions)
+        if self.overlap_weight:
+            values += self.overlap_weight * overlapPenalty(positions)
+        return values
+
+    def OrderTerm(self, angles, positions):
+        """
+        :return: Objective without overlap penalty with shape (batch,)
+        """
+        values = np.zeros(angles.shape[0])
+        for name, (target, weight) in self.targets.items():
+            values += weight * (self.parameters[name](angles, positions) - target) ** 2
+        return values
+
+    def EvaluateMoves(self, overlap_tracker, candidate_angles, candidate_positions, moved):
+        """
+        :param overlap_tracker: OverlapTracker of current positions, None when overlaps are allowed
+        :param candidate_angles: Candidate angles with shape (batch, bots)
+        :param candidate_positions: Candidate positions with shape (batch, bots, 2)
+        :param moved: Indices of bots moved in every candidate with shape (batch, moved), None if only angles changed
+        :return: Objective values of candidates with shape (batch,)
+
+        Overlap penalty is updated only for pairs with moved bots
+        """
+        penalties = np.zeros(candidate_angles.shape[0])
+        if overlap_tracker is not None:
+            penalties += overlap_tracker.penalty
+            if moved is not None:
+                penalties += overlap_tracker.PenaltyChange(candidate_positions, moved)
+        return self.OrderTerm(candidate_angles, candidate_positions) + self.overlap_weight * penalties
+
+
+def parseObjective(text, overlap_weight=DEFAULT_OVERLAP_WEIGHT):
+    """
+    :param text: Comma separated terms 'name=target' or 'name=target*weight', e.g. 'polar=0.8, nematic=0.2*0.5'
+    :return: Objective object
+    """
+
+    targets = {}
+    for term in text.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        if '=' not in term:
+            raise ValueError(f'Objective term {term!r} should look like name=target')
+        name, value = (part.strip() for part in term.split('=', 1))
+        target, _, weight = value.partition('*')
+        targets[name] = (float(target), float(weight) if weight else 1.0)
+
+    if not targets:
+        raise ValueError('Objective should contain at least one term')
+    return Objective(targets, overlap_weight=overlap_weight)
+
+
+class ConfigurationOptimizer():
+    """
+    Batched stochastic search over bots angles and positions.
+
+    Every iteration a batch of candidates is made by perturbing a random subset of bots of the
+    current configuration, the whole batch is evaluated at once and the best candidate is kept
+    if it improves the objective. Iterations alternate between rotating and moving bots, so that
+    rotations are not rejected because of overlaps made by simultaneous moves. Step sizes grow
+    after successful iterations and shrink otherwise.
+
+    While bots overlap, moving iterations also try pushing all bots apart along overlap repulsion,
+    which untangles dense starts far faster than random moves of a few bots.
+    """
+
+    def __init__(self, objective, batch_size=32, angle_step=15.0, position_step=1.0, max_position_step=10.0,
+                 move_fraction=0.1, max_moved_positions=32, seed=None):
+        """
+        :param max_moved_positions: Maximal number of bots moved by a random candidate, bounds cost of overlap updates
+        """
+
+        self.objective = objective
+        self.batch_size = batch_size
+        self.angle_step = angle_step
+        self.position_step = position_step
+        self.max_position_step = max_position_step
+        self.move_fraction = move_fraction
+        self.max_moved_positions = max_moved_positions
+        self.random = np.random.default_rng(seed)
+
+    def Run(self, bots_positions, iterations=5000, tolerance=1E-6, progress_callback=None,
+            progress_every=20, cancel_event=None):
+        """
+        :param bots_positions: Bots positions in Configuration format
+        :param iterations: Maximal number of iterations
+        :param tolerance: Stop when objective value falls below it
+        :param progress_callback: Called as progress_callback(iteration, iterations, value)
+        :param progress_every: Number of iterations between progress_callback calls
+        :param cancel_event: threading.Event, the best configuration so far is returned once it is set
+        :return: Optimized bots positions in Configuration format and objective value
+        """
+
+        bots_number = len(bots_positions)
+        if bots_number == 0:
+            return [], 0.0
+
+        identifiers = [bot[0] for bot in bots_positions]
+        angles = np.array([bot[1] for bot in bots_positions], dtype=float)
+        positions = np.array([bot[2] for bot in bots_positions], dtype=float)
+        #overlaps are only checked between neighbors, see OverlapTracker
+        overlap_tracker = OverlapTracker(positions) if self.objective.overlap_weight else None
+        penalty = overlap_tracker.penalty if overlap_tracker is not None else 0.0
+        value = (self.objective.OrderTerm(angles[np.newaxis], positions[np.newaxis])[0]
+                 + self.objective.overlap_weight * penalty)
+
+        angle_step = self.angle_step
+        position_step = self.position_step
+        moved_number = max(1, int(round(bots_number * self.move_fraction)))
+
+        iteration = 0
+        for iteration in range(1, iterations + 1):
+            if value <= tolerance or (cancel_event is not None and cancel_event.is_set()):
+                break
+
+            current_moved_number = moved_number if iteration % 2 else min(moved_number, self.max_moved_positions)
+            moved = self.random.random((self.batch_size, bots_number)).argpartition(
+                current_moved_number - 1, axis=1)[:, :current_moved_number]
+
+            if iteration % 2:
+                candidate_angles = np.repeat(angles[np.newaxis], self.batch_size, axis=0)
+                np.put_along_axis(candidate_angles, moved, np.take_along_axis(candidate_angles, moved, axis=1)
+                                  + self.random.normal(0, angle_step, moved.shape), axis=1)
+                candidate_positions = np.broadcast_to(positions, (self.batch_size,) + positions.shape)
+                candidate_values = self.objective.EvaluateMoves(overlap_tracker, candidate_angles, candidate_positions,
+                                                                None)
+            else:
+                candidate_angles = np.broadcast_to(angles, (self.batch_size,) + angles.shape)
+                candidate_positions = np.repeat(positions[np.newaxis], self.batch_size, axis=0)
+                np.put_along_axis(candidate_positions, moved[:, :, np.newaxis],
+                                  np.take_along_axis(candidate_positions, moved[:, :, np.newaxis], axis=1)
+                                  + self.random.normal(0, position_step, moved.shape + (2,)), axis=1)
+                if overlap_tracker is not None:
+                    overlap_tracker.ClipMoves(candidate_positions, moved)
+                candidate_values = self.objective.EvaluateMoves(overlap_tracker, candidate_angles, candidate_positions,
+                                                                moved)
+
+            best = candidate_values.argmin()
+            improved = candidate_values[best] < value
+            if improved:
+                value = candidate_values[best]
+                angles = candidate_angles[best].copy()
+                positions = candidate_positions[best].copy()
+                if overlap_tracker is not None and not iteration % 2:
+                    overlap_tracker.SetPositions(positions)
+
+            if overlap_tracker is not None and overlap_tracker.penalty > 0 and not iteration % 2:
+                relaxed_value, relaxed_positions = self._relax(overlap_tracker, angles)
+                if relaxed_value < value:
+                    improved = True
+                    value = relaxed_value
+                    positions = relaxed_positions
+                    overlap_tracker.SetPositions(positions, rebuild=True)
+
+            if iteration % 2:
+                angle_step = min(angle_step * 1.1, 180.0) if improved else max(angle_step * 0.95, 1E-3)
+            else:
+                position_step = (min(position_step * 1.1, self.max_position_step) if improved
+                                 else max(position_step * 0.95, 1E-4))
+
+            if progress_callback is not None and iteration % progress_every == 0:
+                progress_callback(iteration, iterations, float(value))
+
+        if progress_callback is not None:
+            progress_callback(iteration, iterations, float(value))
+
+        angles = np.mod(angles, 360)
+        #fields after the position are kept as they were
+        optimized = [[identifiers[i], float(angles[i]), (float(positions[i][0]), float(positions[i][1]))]
+                     + list(bots_positions[i][3:]) for i in range(bots_number)]
+        return optimized, float(value)
+
+    def _relax(self, overlap_tracker, angles):
+        """
+        :return: Best objective value and positions after pushing all bots apart
+
+        Candidates move all bots along overlap repulsion with a few step lengths or spread the whole
+        swarm around its center, the latter quickly unjams swarms packed denser than bots allow
+        """
+
+        positions = overlap_tracker.positions
+        repulsion = overlap_tracker.Repulsion(self.random)
+        center = positions.mean(axis=0)
+        candidates = [positions + repulsion * scale for scale in (0.25, 0.5, 1.0)]
+        candidates += [center + (positions - center) * factor for factor in (1.05, 1.2)]
+
+        best_value, best_positions = np.inf, positions
+        for candidate_positions in candidates:
+            candidate_value = (self.objective.OrderTerm(angles[np.newaxis], candidate_positions[np.newaxis])[0]
+                               + self.objective.overlap_weight * gridOverlapPenalty(candidate_positions,
+                                                                                   overlap_tracker.min_distance))
+            if candidate_value < best_value:
+                best_value, best_positions = candidate_value, candidate_positions
+        return best_value, best_positions
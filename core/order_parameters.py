@@ -0,0 +1,280 @@
+import importlib.util
+
+import numpy as np
+
+from core.constants import BOT_REAR_RADIUS, DEG2RAD
+
+
+'''Registered order parameters'''
+
+#name -> function(angles, positions) -> values
+#angles are in degrees with shape (batch, bots), positions have shape (batch, bots, 2), values have shape (batch,)
+ORDER_PARAMETERS = {}
+
+
+def registerOrderParameter(name):
+    """
+    :param name: Name used in objectives, e.g. 'polar'
+    :return: Decorator registering vectorized order parameter function
+    """
+
+    def decorator(function):
+        ORDER_PARAMETERS[name] = function
+        return function
+
+    return decorator
+
+
+def getOrderParameter(name):
+    if name not in ORDER_PARAMETERS:
+        raise KeyError(f'Unknown order parameter {name!r}, registered: {", ".join(sorted(ORDER_PARAMETERS))}')
+    return ORDER_PARAMETERS[name]
+
+
+def registerOrderParameterScript(name, filename):
+    """
+    :param name: Name used in objectives
+    :param filename: Parameter script as in sandbox.py, it is imported, so work should stay under its __main__ guard
+    :return: True if the script defines vectorized calculateParameterBatch(angles, positions) and it was registered
+
+    Value of the script shown by the parameter panel is still calculated by running it on a saved configuration
+    """
+
+    if name in BUILTIN_ORDER_PARAMETERS:
+        raise ValueError(f'{name!r} is a built-in order parameter')
+    spec = importlib.util.spec_from_file_location('_order_parameter_script', filename)
+    if spec is None:
+        raise ValueError(f'{filename} is not a Python script')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    function = getattr(module, 'calculateParameterBatch', None)
+    if function is None:
+        return False
+    registerOrderParameter(name)(function)
+    return True
+
+
+def unregisterOrderParameter(name):
+    """
+    Remove order parameter registered from a script, built-in ones are kept
+    """
+    if name not in BUILTIN_ORDER_PARAMETERS:
+        ORDER_PARAMETERS.pop(name, None)
+
+
+@registerOrderParameter('polar')
+def polarOrder(angles, positions):
+    """
+    Modulus of mean heading unit vector, 1 for fully aligned swarm
+    """
+    phases = np.exp(1j * angles * DEG2RAD)
+    return np.abs(phases.mean(axis=-1))
+
+
+@registerOrderParameter('nematic')
+def nematicOrder(angles, positions):
+    """
+    Same as polar order for doubled angles, insensitive to head-tail flips
+    """
+    phases = np.exp(2j * angles * DEG2RAD)
+    return np.abs(phases.mean(axis=-1))
+
+
+BUILTIN_ORDER_PARAMETERS = frozenset(ORDER_PARAMETERS)
+
+
+#upper bound of pairwise distances computed at once, keeps memory of overlap checks bounded
+OVERLAP_CHUNK_ELEMENTS = 1 << 20
+
+
+def overlapPenalty(positions, min_distance=2 * BOT_REAR_RADIUS):
+    """
+    :param positions: Bots positions with shape (batch, bots, 2)
+    :param min_distance: Distance between centers below which bots overlap
+    :return: Sum of squared overlap depths over all pairs with shape (batch,)
+    """
+
+    batch_size, bots_number = positions.shape[:2]
+    #rows are processed in chunks so that memory stays bounded for large swarms
+    chunk = max(1, OVERLAP_CHUNK_ELEMENTS // max(1, batch_size * bots_number))
+    penalty = np.zeros(batch_size)
+    for start in range(0, bots_number, chunk):
+        rows = np.arange(start, min(start + chunk, bots_number))
+        depth2 = _overlapDepth2(positions[:, rows, np.newaxis, :], positions[:, np.newaxis, :, :], min_distance)
+        #bot paired with itself
+        depth2[:, np.arange(len(rows)), rows] = 0
+        penalty += depth2.sum(axis=(1, 2))
+    #each pair is counted twice
+    return penalty / 2
+
+
+#upper bound of candidate pairs examined at once while building neighbor lists
+NEIGHBOR_CHUNK_PAIRS = 1 << 20
+
+
+def gridOverlapPenalty(positions, min_distance=2 * BOT_REAR_RADIUS):
+    """
+    :param positions: Bots positions with shape (bots, 2)
+    :return: Same as overlapPenalty for one configuration, pairs are found on a cell grid in O(bots + pairs)
+    """
+
+    rows, columns = _neighborPairs(positions, min_distance)
+    return float(_overlapDepth2(positions[rows], positions[columns], min_distance).sum() / 2)
+
+
+class OverlapTracker():
+    """
+    Overlap penalty of a current configuration with cheap updates for candidate moves.
+
+    Pairs are only checked within Verlet neighbor lists of radius min_distance + skin built on a
+    cell grid and stored in compressed sparse row layout. Candidate bots are kept within skin / 2
+    of the positions the lists were built for, and the lists are rebuilt once the current
+    configuration drifts by more than skin / 4, so every overlapping pair is always in the lists
+    and the penalty is exact.
+    """
+
+    def __init__(self, positions, min_distance=2 * BOT_REAR_RADIUS, skin=None):
+        """
+        :param positions: Bots positions with shape (bots, 2)
+        :param min_distance: Distance between centers below which bots overlap
+        :param skin: Extra radius of neighbor lists, min_distance / 2 by default
+        """
+
+        self.min_distance = min_distance
+        self.skin = min_distance / 2 if skin is None else skin
+        self.SetPositions(positions, rebuild=True)
+
+    def SetPositions(self, positions, rebuild=False):
+        self.positions = np.array(positions, dtype=float)
+        if rebuild or self._maxDrift() > self.skin / 4:
+            self.reference_positions = self.positions.copy()
+            rows, columns = _neighborPairs(self.positions, self.min_distance + self.skin)
+            #rows are sorted, so neighbors of bot i are indices[indptr[i]:indptr[i + 1]]
+            self.entry_rows = rows
+            self.indices = columns
+            self.degrees = np.bincount(rows, minlength=len(self.positions))
+            self.indptr = np.concatenate(([0], np.cumsum(self.degrees)))
+
+        #squared overlap depth of every stored pair
+        self.depth2 = _overlapDepth2(self.positions[self.entry_rows], self.positions[self.indices], self.min_distance)
+        self.penalty = float(self.depth2.sum() / 2)
+
+    def ClipMoves(self, candidate_positions, moved):
+        """
+        :param candidate_positions: Candidate positions with shape (batch, bots, 2), changed in place
+        :param moved: Indices of moved bots with shape (batch, moved)
+
+        Pull moved bots back within skin / 2 of the positions neighbor lists were built for
+        """
+
+        indices = moved[:, :, np.newaxis]
+        reference = self.reference_positions[moved]
+        displacement = np.take_along_axis(candidate_positions, indices, axis=1) - reference
+        length = np.sqrt((displacement ** 2).sum(axis=-1, keepdims=True))
+        scale = np.minimum(1, (self.skin / 2) / np.maximum(length, 1E-12))
+        np.put_along_axis(candidate_positions, indices, reference + displacement * scale, axis=1)
+
+    def PenaltyChange(self, candidate_positions, moved):
+        """
+        :param candidate_positions: Candidate positions with shape (batch, bots, 2) after ClipMoves
+        :param moved: Indices of bots which differ from current positions with shape (batch, moved), no repeats
+        :return: Change of overlap penalty for every candidate with shape (batch,)
+
+        Costs O(batch * moved * neighbors) instead of O(batch * bots^2)
+        """
+
+        batch_size, moved_number = moved.shape
+        flat_moved = moved.ravel()
+        degrees = self.degrees[flat_moved]
+        owners = np.repeat(np.arange(flat_moved.size), degrees)
+        #index of every examined pair in the neighbor lists
+        entries = np.repeat(self.indptr[flat_moved] - (np.cumsum(degrees) - degrees), degrees) + np.arange(owners.size)
+
+        batches = owners // moved_number
+        rows = flat_moved[owners]
+        columns = self.indices[entries]
+        new_depth2 = _overlapDepth2(candidate_positions[batches, rows], candidate_positions[batches, columns],
+                                    self.min_distance)
+
+        #pairs of two moved bots are examined from both sides, so each side counts half
+        is_moved = np.zeros(candidate_positions.shape[:2], dtype=bool)
+        np.put_along_axis(is_moved, moved, True, axis=1)
+        weights = np.where(is_moved[batches, columns], 0.5, 1.0)
+        return np.bincount(batches, weights=(new_depth2 - self.depth2[entries]) * weights, minlength=batch_size)
+
+    def Repulsion(self, random=None):
+        """
+        :param random: numpy Generator used to separate bots sitting exactly on top of each other
+        :return: Direction of steepest descent of the penalty scaled by overlap depths, shape (bots, 2)
+        """
+
+        delta = self.positions[self.entry_rows] - self.positions[self.indices]
+        distances = np.sqrt((delta ** 2).sum(axis=1))
+        depth = np.sqrt(self.depth2)
+        stacked = (distances == 0) & (depth > 0)
+        if stacked.any():
+            random = np.random.default_rng() if random is None else random
+            angles = random.uniform(0, 2 * np.pi, stacked.sum())
+            delta[stacked] = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+            distances[stacked] = 1
+        contribution = delta * (depth / np.maximum(distances, 1E-12))[:, np.newaxis]
+        bots_number = len(self.positions)
+        return np.stack((np.bincount(self.entry_rows, weights=contribution[:, 0], minlength=bots_number),
+                         np.bincount(self.entry_rows, weights=contribution[:, 1], minlength=bots_number)), axis=1)
+
+    def _maxDrift(self):
+        if len(self.positions) == 0:
+            return 0.0
+        return float(np.sqrt(((self.positions - self.reference_positions) ** 2).sum(axis=1).max()))
+
+
+def _neighborPairs(positions, radius):
+    """
+    :return: Rows and columns of all ordered pairs of distinct bots closer than radius, sorted by rows
+    """
+
+    bots_number = len(positions)
+    if bots_number == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    #bots are sorted by cell of size radius, neighbors are searched in 3x3 cells around each bot
+    cells = np.floor(positions / radius).astype(np.int64)
+    cells -= cells.min(axis=0)
+    width = cells[:, 1].max() + 3
+    keys = (cells[:, 0] + 1) * width + (cells[:, 1] + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    rows, columns = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            cell_keys = keys + dx * width + dy
+            start = np.searchsorted(sorted_keys, cell_keys, side='left')
+            counts = np.searchsorted(sorted_keys, cell_keys, side='right') - start
+            cumulative = np.cumsum(counts)
+
+            #bots are taken in chunks so that memory of candidate pairs stays bounded
+            first = 0
+            while first < bots_number:
+                done = cumulative[first - 1] if first else 0
+                last = max(first + 1, int(np.searchsorted(cumulative, done + NEIGHBOR_CHUNK_PAIRS, side='right')))
+                chunk_counts = counts[first:last]
+                chunk_rows = np.repeat(np.arange(first, last), chunk_counts)
+                offsets = np.arange(chunk_rows.size) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+                chunk_columns = order[np.repeat(start[first:last], chunk_counts) + offsets]
+                distances2 = ((positions[chunk_rows] - positions[chunk_columns]) ** 2).sum(axis=1)
+                close = (distances2 < radius ** 2) & (chunk_rows != chunk_columns)
+                rows.append(chunk_rows[close])
+                columns.append(chunk_columns[close])
+                first = last
+
+    rows = np.concatenate(rows)
+    columns = np.concatenate(columns)
+    by_rows = np.argsort(rows, kind='stable')
+    return rows[by_rows], columns[by_rows]
+
+
+def _overlapDepth2(first, second, min_distance):
+    distances = np.sqrt(((first - second) ** 2).sum(axis=-1))
+    return np.clip(min_distance - distances, 0, None) ** 2
@@ -3,22 +3,23 @@ import numpy as np
 import sys
 import os
 import subprocess
+import threading
 
 
-'''Global constants'''
-
-print(os.path.dirname(os.path.realpath(__file__)))
+from core.configuration import Configuration
+from core.diff import ConfigurationDiff
+from core.constants import BOT_REAR_RADIUS, BOT_LENGTH, DEG2RAD
+from core.geometry import calcTangentPoints, getDistance
+from core.journal import ConfigurationJournal
+from core.optimizer import ConfigurationOptimizer, parseObjective
+from core.order_parameters import ORDER_PARAMETERS, registerOrderParameterScript, unregisterOrderParameter
 
-#bot shape parameters
-BOT_REAR_RADIUS = 2.5
-BOT_NOSE_ANGLE = np.pi / 8
-BOT_LENGTH = BOT_REAR_RADIUS + BOT_REAR_RADIUS / np.sin(BOT_NOSE_ANGLE)
 
-#math constants
-DEG2RAD = np.pi / 180
+'''Global constants'''
 
 #applications initial constants
 BUFFER_FILENAME_FOR_CONFIG_SAVING = os.path.dirname(os.path.realpath(__file__)) + '\\bufferconfig.npy'
+AUTOSAVE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'autosave')
 
 DEFAULT_MAIN_WINDOW_SIZE = (1280, 770)
 
@@ -26,10 +27,11 @@ DEFAULT_PARAMETER_PANEL_SIZE = (360, 240)
 DEFAULT_PARAMETERS_LIST_NUMBER_COLUMN_WIDTH = 40
 DEFAULT_PARAMETERS_LIST_NAME_COLUMN_WIDTH = 160
 DEFAULT_PARAMETERS_LIST_VALUE_COLUMN_WIDTH = 160
+DEFAULT_OPTIMIZER_ITERATIONS = 5000
 
 DEFAULT_BOTS_PANEL_SIZE = (360, 480)
 DEFAULT_BOTS_NUMBER_TEXT_SIZE = (320, 20)
-DEFAULT_BUTTON_SIZE = (120, 20)
+DEFAULT_BUTTON_SIZE = (90, 20)
 DEFAULT_ADD_BUTTON_SIZE = (80, 20)
 DEFAULT_BOTS_LIST_SIZE = (360, 420)
 DEFAULT_BOTS_LIST_NUMBER_COLUMN_WIDTH = 80
@@ -38,48 +40,7 @@ DEFAULT_BOTS_LIST_ANGLE_COLUMN_WIDTH = 80
 DEFAULT_BOTS_LIST_COORDINATE_COLUMN_WIDTH = 140
 
 DEFAULT_PICTURE_PANEL_SIZE = (920, 720)
-
-
-'''Useful functions'''
-
-
-def calcTangentPoints(c: float, r: float, p: float, eps: float = 1E-9) -> tuple:
-    """
-    :param c: X-axis coordinate of circle center
-    :param r: Circle radius
-    :param p: X-axis coordinate of outer point
-    :return: Tangent points in ((X, Y), (X, Y)) format
-    :param eps: Threshold to consume two numbers equiv
-
-    Calculate coordinates of intersection of tangents from outer points to circle. Return one or two
-    points depending on point position
-    """
-
-    if r < 0:
-        non_negative_error = ValueError('r should be a positive number')
-        raise non_negative_error
-
-    if abs(p - c) < r:
-        return ()
-
-    if abs(abs(p - c) - r) <= eps:
-        return p, 0
-
-    x = (r**2 - c**2 + c * p) / (p - c)
-    y = (r**2 - (x - c)**2)**0.5
-    return (x, y), (x, -y)
-
-def sumPoints(p1, p2, scale):
-    return (p1[0] + scale * p2[0],
-            p1[1] + scale * p2[1])
-
-def getDistance(p1, p2):
-    """
-    :param p1: First point in (X, Y) format
-    :param p2: Second point in (X, Y) format
-    :return: Euclidean distance between given points
-    """
-    return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
+DEFAULT_DISPLACEMENT_ARROW_HEAD_SIZE = 6
 
 
 '''Graphical Interface'''
@@ -94,15 +55,34 @@ class MainWindow(wx.Frame):
 
         config = Configuration()
 
+        '''Restoring configuration after crash and starting autosave'''
+
+        self.journal = ConfigurationJournal(AUTOSAVE_DIRECTORY,
+                                            error_callback=lambda error: wx.CallAfter(wx.LogError, f'Autosave failed: {error}'))
+        try:
+            recovered_positions = self.journal.Recover()
+            if recovered_positions:
+                config.SetBotsPositions(recovered_positions)
+        except (IOError, ValueError, IndexError, TypeError) as error:
+            # unreadable autosave must not stop the application from starting
+            recovered_positions = None
+            config.ClearConfiguration()
+            self.journal.MoveAside()
+            wx.LogError(f'Cannot recover the previous session, autosave files are renamed to *.bad: {error}')
+        self.journal.Start(config.GetBotsPositions())
+        config.AddListener(self.journal.Record)
+
         '''Main panels'''
 
         mainPanel = wx.Panel(self)
 
         parameterPanel = ParameterPanel(mainPanel, config)
-        botsPanel = BotsPanel(mainPanel, config)
+        botsPanel = BotsPanel(mainPanel, config, self.journal)
         picturePanel = PicturePanel(mainPanel, config)
 
         botsPanel.setPicturePanel(picturePanel)
+        parameterPanel.setBotsPanel(botsPanel)
+        parameterPanel.setPicturePanel(picturePanel)
         picturePanel.setBotsPanel(botsPanel)
 
         hboxsizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -126,16 +106,26 @@ class MainWindow(wx.Frame):
 
         self.Show(True)
         self.Bind(wx.EVT_KEY_DOWN, self.onKeyDown, self)
+        self.Bind(wx.EVT_CLOSE, self.onClose, self)
+
+        if recovered_positions:
+            wx.LogMessage(f'Recovered {len(recovered_positions)} bots from the previous session')
 
     def onKeyDown(self, event):
         print(1)
 
+    def onClose(self, event):
+        # clean exit, nothing to recover on the next start
+        self.journal.Close(discard=True)
+        event.Skip()
+
 
 class BotsPanel(wx.Panel):
-    def __init__(self, parent, config):
+    def __init__(self, parent, config, journal=None):
         wx.Panel.__init__(self, parent, wx.ID_ANY, size=DEFAULT_BOTS_PANEL_SIZE, style=wx.SUNKEN_BORDER)
 
         self.config = config
+        self.journal = journal
         self.picture_panel = None
 
         self.config_edit_mode = 'Add'
@@ -147,10 +137,12 @@ class BotsPanel(wx.Panel):
         self.load_button = wx.Button(self, wx.ID_ANY, "Load", size=DEFAULT_BUTTON_SIZE)
         self.save_button = wx.Button(self, wx.ID_ANY, "Save", size=DEFAULT_BUTTON_SIZE)
         self.clear_button = wx.Button(self, wx.ID_ANY, "Clear", size=DEFAULT_BUTTON_SIZE)
+        self.compare_button = wx.Button(self, wx.ID_ANY, "Compare", size=DEFAULT_BUTTON_SIZE)
 
         self.Bind(wx.EVT_BUTTON, self.onLoad, self.load_button)
         self.Bind(wx.EVT_BUTTON, self.onSave, self.save_button)
         self.Bind(wx.EVT_BUTTON, self.onClear, self.clear_button)
+        self.Bind(wx.EVT_BUTTON, self.onCompare, self.compare_button)
 
 
         self.add_edit_button = wx.Button(self, wx.ID_ANY, "Add", size=DEFAULT_ADD_BUTTON_SIZE)
@@ -179,6 +171,7 @@ class BotsPanel(wx.Panel):
         hboxsizer1.Add(self.load_button, proportion=0, flag=wx.EXPAND)
         hboxsizer1.Add(self.save_button, proportion=0, flag=wx.EXPAND)
         hboxsizer1.Add(self.clear_button, proportion=0, flag=wx.EXPAND)
+        hboxsizer1.Add(self.compare_button, proportion=0, flag=wx.EXPAND)
         vboxsizer.Add(hboxsizer1, proportion=0, flag=wx.EXPAND)
 
         hboxsizer2 = wx.BoxSizer(wx.HORIZONTAL)
@@ -252,19 +245,49 @@ class BotsPanel(wx.Panel):
                 self._updateBotsList()
                 self._updateBotsNumberText()
                 self.picture_panel.callConfigRedraw()
-            except IOError:
-                wx.LogError(f'Cannot open file {filename}')
+            except (IOError, ValueError, IndexError, TypeError) as error:
+                wx.LogError(f'Cannot open file {filename}: {error}')
 
     def onSave(self, event):
         with wx.FileDialog(self, "Save .npy file", wildcard="*.npy", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as filedialog:
             if filedialog.ShowModal() == wx.ID_CANCEL:
                 return
             filename = filedialog.GetPath()
+            if self.journal is not None:
+                self.journal.SaveAsync(filename, self.config.GetBotsPositions(),
+                                       lambda error: self._onSaveDone(filename, error))
+                return
             try:
                 self.config.SaveConfiguration(filename)
             except IOError:
                 wx.LogError(f'Cannot save into {filename}')
 
+    def _onSaveDone(self, filename, error):
+        # called from the journal writer thread
+        if error is not None:
+            wx.CallAfter(wx.LogError, f'Cannot save into {filename}')
+
+    def onCompare(self, event):
+        if self.picture_panel.reference_positions is not None:
+            self.picture_panel.setReferencePositions(None)
+            self.compare_button.SetLabel('Compare')
+            self.picture_panel.callConfigRedraw()
+            return
+
+        with wx.FileDialog(self, "Open reference .npy file", wildcard='*.npy', style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as filedialog:
+            if filedialog.ShowModal() == wx.ID_CANCEL:
+                return
+            filename = filedialog.GetPath()
+            try:
+                reference = Configuration()
+                reference.LoadConfiguration(filename)
+            except (IOError, ValueError, IndexError, TypeError) as error:
+                wx.LogError(f'Cannot open file {filename}: {error}')
+                return
+            self.picture_panel.setReferencePositions(reference.GetBotsPositions())
+            self.compare_button.SetLabel('Hide diff')
+            self.picture_panel.callConfigRedraw()
+
     def onClear(self, event):
         self.config.ClearConfiguration()
         self._updateBotsNumberText()
@@ -339,6 +362,12 @@ class ParameterPanel(wx.Panel):
 
         self.config = config
         self.scale = scale
+        self.bots_panel = None
+        self.picture_panel = None
+
+        self.optimizer_thread = None
+        self.optimizer_cancel_event = threading.Event()
+        self.optimizer_start_positions = None
 
         self.parameter_name = ''
         self.parameters = {}
@@ -360,12 +389,26 @@ class ParameterPanel(wx.Panel):
 
         self.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self.onItemRightClick, self.parameters_list)
 
+        self.objective_text_ctrl = wx.TextCtrl(self, wx.ID_ANY, 'polar=0.8')
+        self.optimize_button = wx.Button(self, wx.ID_ANY, 'Optimize')
+        self.optimizer_gauge = wx.Gauge(self, wx.ID_ANY, range=DEFAULT_OPTIMIZER_ITERATIONS)
+        self.order_parameters_text = wx.StaticText(self, wx.ID_ANY, '')
+        self.optimizer_status_text = wx.StaticText(self, wx.ID_ANY, '')
+        self._updateOrderParametersText()
+
+        self.Bind(wx.EVT_BUTTON, self.onOptimize, self.optimize_button)
+
         sizer = wx.GridBagSizer()
 
         sizer.Add(self.parameter_name_text_ctrl, (0,0), (1,1), flag=wx.EXPAND)
         sizer.Add(self.load_button, (0,1), (1,1), flag=wx.EXPAND)
         sizer.Add(self.calculate_button, (0,2), (1,1), flag=wx.EXPAND)
         sizer.Add(self.parameters_list, (1,0), (1,3), flag=wx.EXPAND)
+        sizer.Add(self.objective_text_ctrl, (2,0), (1,1), flag=wx.EXPAND)
+        sizer.Add(self.optimize_button, (2,1), (1,1), flag=wx.EXPAND)
+        sizer.Add(self.optimizer_gauge, (2,2), (1,1), flag=wx.EXPAND)
+        sizer.Add(self.order_parameters_text, (3,0), (1,3), flag=wx.EXPAND)
+        sizer.Add(self.optimizer_status_text, (4,0), (1,3), flag=wx.EXPAND)
 
         sizer.AddGrowableRow(0)
         sizer.AddGrowableRow(1)
@@ -375,6 +418,12 @@ class ParameterPanel(wx.Panel):
 
         self.SetSizerAndFit(sizer)
 
+    def setBotsPanel(self, bots_panel):
+        self.bots_panel = bots_panel
+
+    def setPicturePanel(self, picture_panel):
+        self.picture_panel = picture_panel
+
     def onLoad(self, event):
         parameter_name = self.parameter_name_text_ctrl.GetLineText(0)
         if parameter_name in self.parameters.keys():
@@ -388,7 +437,13 @@ class ParameterPanel(wx.Panel):
             filename = filedialog.GetPath()
             self.parameters[parameter_name] = {'file': filename,
                                                'value': None}
+        # scripts defining calculateParameterBatch can also be used in objectives
+        try:
+            registerOrderParameterScript(parameter_name, filename)
+        except Exception as error:
+            wx.LogWarning(f'{filename} can not be used in objectives: {error!r}')
         self._updateParametersList()
+        self._updateOrderParametersText()
         print(self.parameter_file)
 
     def onCalculate(self, event):
@@ -401,11 +456,77 @@ class ParameterPanel(wx.Panel):
             self.parameters[parameter_name]['value'] = parameter_value
         self._updateParametersList()
 
+    def onOptimize(self, event):
+        if self.optimizer_thread is not None:
+            self.optimizer_cancel_event.set()
+            self.optimize_button.Disable()
+            return
+
+        try:
+            objective = parseObjective(self.objective_text_ctrl.GetLineText(0))
+        except (ValueError, KeyError) as error:
+            wx.LogError(str(error.args[0]))
+            return
+
+        optimizer = ConfigurationOptimizer(objective)
+        bots_positions = self.config.CopyBotsPositions()
+        self.optimizer_start_positions = self.config.CopyBotsPositions()
+        self.optimizer_cancel_event.clear()
+        self.optimizer_gauge.SetValue(0)
+        self.optimize_button.SetLabel('Cancel')
+        self.optimizer_thread = threading.Thread(target=self._runOptimizer, args=(optimizer, bots_positions), daemon=True)
+        self.optimizer_thread.start()
+
+    def _runOptimizer(self, optimizer, bots_positions):
+        # runs in optimizer thread, GUI is only touched through wx.CallAfter
+        optimized, value = None, None
+        try:
+            optimized, value = optimizer.Run(bots_positions, iterations=DEFAULT_OPTIMIZER_ITERATIONS,
+                                             progress_callback=lambda *progress: wx.CallAfter(self._onOptimizerProgress, *progress),
+                                             cancel_event=self.optimizer_cancel_event)
+        except Exception as error:
+            wx.CallAfter(wx.LogError, f'Optimization failed: {error!r}')
+        finally:
+            wx.CallAfter(self._onOptimizerDone, optimized, value)
+
+    def _onOptimizerProgress(self, iteration, iterations, value):
+        self.optimizer_gauge.SetValue(iteration)
+        self.optimizer_status_text.SetLabel(f'Iteration {iteration}/{iterations}, objective {value:.6f}')
+
+    def _onOptimizerDone(self, optimized, value):
+        self.optimizer_thread = None
+        self.optimize_button.SetLabel('Optimize')
+        self.optimize_button.Enable()
+        start_positions = self.optimizer_start_positions
+        self.optimizer_start_positions = None
+
+        if optimized is None:
+            self.optimizer_gauge.SetValue(0)
+            self.optimizer_status_text.SetLabel('Optimization failed')
+            return
+
+        self.optimizer_gauge.SetValue(self.optimizer_gauge.GetRange())
+        # result was computed from the configuration at start, edits made meanwhile are not overwritten
+        if self.config.CopyBotsPositions() != start_positions:
+            self.optimizer_status_text.SetLabel('Configuration changed during optimization, result discarded')
+            wx.LogWarning('Configuration was edited during optimization, optimized result is discarded')
+            return
+
+        self.optimizer_status_text.SetLabel(f'Done, objective {value:.6f}')
+        self.config.SetBotsPositions(optimized)
+        self.bots_panel.updatePanel()
+        self.picture_panel.callConfigRedraw()
+
     def onItemRightClick(self, event):
         item_index = event.Index
         item = self.parameters_list.GetItem(item_index, col=1).GetText()
         self.parameters.pop(item)
+        unregisterOrderParameter(item)
         self._updateParametersList()
+        self._updateOrderParametersText()
+
+    def _updateOrderParametersText(self):
+        self.order_parameters_text.SetLabel(f'Order parameters: {", ".join(sorted(ORDER_PARAMETERS))}')
 
 
     def _updateParametersList(self):
@@ -431,6 +552,7 @@ class PicturePanel(wx.Panel):
         self.center = (self.Size[0] // 2, self.Size[1] // 2)
         self.selected_bot_id = None
         self.previous_mouse_pos = None
+        self.reference_positions = None
 
         self.Bind(wx.EVT_PAINT, self.onPaint, self)
 
@@ -454,6 +576,12 @@ class PicturePanel(wx.Panel):
         self.pen_color = "navy"
         self.Refresh(eraseBackground=True)
 
+    def setReferencePositions(self, reference_positions):
+        """
+        :param reference_positions: Bots positions to draw displacement arrows from, None hides them
+        """
+        self.reference_positions = reference_positions
+
     def setSelectedBotId(self, id):
         self.selected_bot_id = id
 
@@ -472,6 +600,9 @@ class PicturePanel(wx.Panel):
             self._addConfigToPath(path)
             self.gc.StrokePath(path)
 
+            if self.reference_positions is not None:
+                self._drawDisplacementField()
+
     def onLeftDoubleClick(self, event):
         print('Double click')
         mouse_screen_pos = event.GetPosition()
@@ -563,6 +694,35 @@ class PicturePanel(wx.Panel):
             self._addBotToPath(graphics_path, points)
 
 
+    def _drawDisplacementField(self):
+        # diff is recomputed on every redraw, so arrows follow edits of the current configuration
+        diff = ConfigurationDiff(self.reference_positions, self.config.GetBotsPositions())
+        head = DEFAULT_DISPLACEMENT_ARROW_HEAD_SIZE
+
+        path = self.gc.CreatePath()
+        for start, end in zip(diff.start_positions, diff.end_positions):
+            start = self._directCoordinateTransform(start[0], start[1])
+            end = self._directCoordinateTransform(end[0], end[1])
+            length = getDistance(start, end)
+            if length < 1:
+                continue
+            direction = ((end[0] - start[0]) / length, (end[1] - start[1]) / length)
+            path.MoveToPoint(start[0], start[1])
+            path.AddLineToPoint(end[0], end[1])
+            for side in (1, -1):
+                path.MoveToPoint(end[0], end[1])
+                path.AddLineToPoint(end[0] - head * (direction[0] + side * direction[1] / 2),
+                                    end[1] - head * (direction[1] - side * direction[0] / 2))
+
+        self.gc.SetPen(wx.Pen("red", 1))
+        self.gc.StrokePath(path)
+
+        summary = diff.Summary()
+        self.gc.SetFont(wx.NORMAL_FONT, wx.BLACK)
+        self.gc.DrawText(f'Matched: {summary["matched"]}  added: {summary["added"]}  removed: {summary["removed"]}  '
+                         f'MSD: {summary["msd"]:.4g}  MSR: {summary["msr"]:.4g} rad^2', 5, 5)
+        self.gc.SetPen(wx.Pen(self.pen_color, 1))
+
     def _addBotToPath(self, graphics_path, bot_points):
         scale = self.scale
         nose_point =bot_points[0]
@@ -640,84 +800,6 @@ class PicturePanel(wx.Panel):
         return physical_pos
 
 
-
-
-
-
-
-
-
-
-'''Bots configuration part'''
-
-
-class Configuration():
-    def __init__(self):
-        self.bots_positions = []
-        self.used_ids = [False for i in range(1000)]
-
-    def GetBotsPositions(self):
-        return self.bots_positions
-
-    def GetBotsNumber(self):
-        return len(self.bots_positions)
-
-    def GetUsedIds(self):
-        return self.used_ids
-
-    def GetBotPosById(self, identifier):
-        for i in range(len(self.bots_positions)):
-            if self.bots_positions[i][0] == identifier:
-                return self.bots_positions[i][1], self.bots_positions[i][2]
-
-    def EditBot(self, identifier, angle=None, pos=None):
-        if angle is None and pos is None:
-            return
-
-        for i in range(len(self.bots_positions)):
-            if self.bots_positions[i][0] == identifier:
-                if angle is not None:
-                    self.bots_positions[i][1] = angle
-                if pos is not None:
-                    self.bots_positions[i][2] = pos
-                return
-
-    def MoveBot(self, identifier, delta_angle=None, delta_pos=None):
-        if delta_angle is None and delta_pos is None:
-            return
-
-        for i in range(len(self.bots_positions)):
-            if self.bots_positions[i][0] == identifier:
-                if delta_angle is not None:
-                    self.bots_positions[i][1] += delta_angle
-                if delta_pos is not None:
-                    self.bots_positions[i][2] = sumPoints(self.bots_positions[i][2], delta_pos, scale=1)
-                return
-
-    def DeleteBot(self, identifier):
-        if identifier is None:
-            return
-        for i in range(len(self.bots_positions)):
-            if self.bots_positions[i][0] == identifier:
-                self.bots_positions.remove(self.bots_positions[i])
-                self.used_ids[identifier] = False
-                return
-
-    def LoadConfiguration(self, filename):
-        self.bots_positions = np.load(filename, allow_pickle=True).tolist()
-
-    def SaveConfiguration(self, filename):
-        np.save(filename, np.array(self.bots_positions, dtype=object), allow_pickle=True)
-
-    def AddBot(self, identifier, angle, center):
-        if not self.used_ids[identifier]:
-            self.bots_positions.append([identifier, angle, center])
-            self.used_ids[identifier] = True
-
-    def ClearConfiguration(self):
-        self.bots_positions = []
-
-
 if __name__ == '__main__':
     app = wx.App(False)
     frame = MainWindow(None, "First program")
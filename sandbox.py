@@ -13,6 +13,14 @@ def calculateParameter(bots_positions):
     return 'Гвоздь в жопе'
 
 
+def calculateParameterBatch(angles, positions):
+    """
+    Optional vectorized version used by Optimize, angles in degrees have shape (batch, bots),
+    positions have shape (batch, bots, 2), should return values with shape (batch,)
+    """
+    return np.zeros(angles.shape[0])
+
+
 if __name__ == '__main__':
     filename = str(sys.argv[1])
     positions = loadBotsPositions(filename)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+#tests import the core package from the repository root, whatever directory pytest is run from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -0,0 +1,19 @@
+import numpy as np
+
+from core.configuration import Configuration
+
+
+def test_load_accepts_ids_outside_used_ids(tmp_path):
+    filename = str(tmp_path / 'config.npy')
+    bots_positions = [[1500, 0.0, (0.0, 0.0)], [2.0, 10.0, (1.0, 1.0)], [2.5, 20.0, (2.0, 2.0)]]
+    np.save(filename, np.array(bots_positions, dtype=object), allow_pickle=True)
+
+    config = Configuration()
+    config.LoadConfiguration(filename)
+
+    assert config.GetBotsNumber() == 3
+    assert config.GetUsedIds()[1500] and config.GetUsedIds()[2]
+    config.DeleteBot(1500)
+    config.DeleteBot(2.5)
+    assert not config.GetUsedIds()[1500]
+    assert config.GetBotsNumber() == 1
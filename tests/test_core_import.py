@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+from core.__main__ import IMPORT_TIME_BUDGET, REPOSITORY_DIRECTORY, measureImportTime
+
+
+def test_core_import_does_not_load_heavy_modules():
+    code = ('import sys, core, core.configuration, core.geometry, core.constants, core.journal\n'
+            'print(sorted(name for name in ("numpy", "wx") if name in sys.modules))')
+    completed_process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                       cwd=REPOSITORY_DIRECTORY)
+    assert completed_process.stdout.strip() == '[]'
+
+
+def test_core_import_time_is_within_budget():
+    assert measureImportTime() <= IMPORT_TIME_BUDGET
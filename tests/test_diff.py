@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from core.__main__ import main
+from core.configuration import Configuration
+from core.diff import ConfigurationDiff, iterFrameDiffs, iterFrameFiles
+
+
+def test_diff_matches_bots_by_identifier():
+    before = [[1, 0.0, (0.0, 0.0)], [2, 350.0, (1.0, 1.0)], [3, 0.0, (5.0, 5.0)]]
+    after = [[4, 0.0, (9.0, 9.0)], [2, 10.0, (1.0, 3.0)], [1, 90.0, (3.0, 4.0)]]
+
+    diff = ConfigurationDiff(before, after, dt=0.5)
+
+    assert diff.identifiers == [2, 1]
+    assert diff.added_ids == [4]
+    assert diff.removed_ids == [3]
+    assert np.allclose(diff.displacements, [[0.0, 2.0], [3.0, 4.0]])
+    assert np.allclose(diff.rotations, [20.0, 90.0])
+    assert np.isclose(diff.MeanSquaredDisplacement(), (4.0 + 25.0) / 2)
+    assert np.isclose(diff.TranslationalDiffusion(), diff.MeanSquaredDisplacement() / 2)
+
+
+@pytest.mark.parametrize('dt', [0, -1.0])
+def test_diff_rejects_non_positive_dt(dt):
+    with pytest.raises(ValueError):
+        ConfigurationDiff([], [], dt=dt)
+    with pytest.raises(ValueError):
+        list(iterFrameDiffs([[], []], dt=dt))
+
+
+def test_frames_are_streamed_from_saved_files(tmp_path, capsys):
+    frames = [
+        [[1, 0.0, (0.0, 0.0)], [2, 0.0, (10.0, 0.0)]],
+        [[1, 90.0, (1.0, 0.0)], [2, 0.0, (10.0, 2.0)], [3, 0.0, (20.0, 0.0)]],
+        [[1, 90.0, (1.0, 3.0)], [3, 180.0, (20.0, 0.0)]],
+    ]
+    filenames = []
+    for index, frame in enumerate(frames):
+        config = Configuration()
+        config.SetBotsPositions(frame)
+        filenames.append(str(tmp_path / f'frame{index}.npy'))
+        config.SaveConfiguration(filenames[-1])
+
+    summaries = [diff.Summary() for diff in iterFrameDiffs(iterFrameFiles(filenames), dt=2.0)]
+
+    assert [(summary['matched'], summary['added'], summary['removed']) for summary in summaries] == [(2, 1, 0),
+                                                                                                     (2, 0, 1)]
+    assert np.isclose(summaries[0]['msd'], (1.0 + 4.0) / 2)
+    assert np.isclose(summaries[1]['msd'], 9.0 / 2)
+    assert np.isclose(summaries[0]['msr'], (np.pi / 2) ** 2 / 2)
+    assert np.isclose(summaries[1]['translational_diffusion'], 9.0 / 2 / (4 * 2.0))
+
+    assert main(['diff', *filenames, '--dt', '2']) == 0
+    rows = capsys.readouterr().out.splitlines()
+    assert [row.split('\t')[:4] for row in rows[1:]] == [['1', '2', '1', '0'], ['2', '2', '0', '1']]
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.configuration import Configuration
+from core.journal import ConfigurationJournal
+
+
+TESTCONFIG_FILENAME = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'testconfig.npy')
+
+
+def waitFor(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def startJournal(directory, config, **kwargs):
+    journal = ConfigurationJournal(directory, **kwargs)
+    journal.Start(config.GetBotsPositions())
+    config.AddListener(journal.Record)
+    return journal
+
+
+def test_recover_after_crash_keeps_ids_and_extra_fields(tmp_path):
+    config = Configuration()
+    journal = startJournal(str(tmp_path), config)
+    config.LoadConfiguration(TESTCONFIG_FILENAME)
+    first_id = config.GetBotsPositions()[0][0]
+    config.EditBot(first_id, angle=10.0, pos=(1.0, 2.0))
+    config.DeleteBot(config.GetBotsPositions()[1][0])
+    expected = config.CopyBotsPositions()
+
+    # no Close, the writer thread is simply abandoned as in a crash
+    assert waitFor(lambda: ConfigurationJournal(str(tmp_path)).Recover() == expected)
+
+    recovered = ConfigurationJournal(str(tmp_path)).Recover()
+    assert all(type(bot[0]) is int for bot in recovered)
+    assert all(len(bot) == 5 for bot in recovered)
+
+    restored = Configuration()
+    restored.SetBotsPositions(recovered)
+    assert restored.GetBotsNumber() == len(expected)
+    assert restored.GetBotPosById(int(first_id)) == (10.0, (1.0, 2.0))
+    journal.Close(discard=True)
+
+
+def test_save_async_keeps_rows_unchanged(tmp_path):
+    config = Configuration()
+    config.LoadConfiguration(TESTCONFIG_FILENAME)
+    journal = startJournal(str(tmp_path / 'autosave'), config)
+
+    done = threading.Event()
+    errors = []
+    filename = str(tmp_path / 'saved.npy')
+    journal.SaveAsync(filename, config.GetBotsPositions(), lambda error: (errors.append(error), done.set()))
+    assert done.wait(5.0)
+    journal.Close(discard=True)
+
+    assert errors == [None]
+    assert np.load(filename, allow_pickle=True).shape == np.load(TESTCONFIG_FILENAME, allow_pickle=True).shape
+
+
+def test_writer_failure_is_reported_and_close_still_discards(tmp_path):
+    errors = []
+    config = Configuration()
+    journal = startJournal(str(tmp_path), config, error_callback=errors.append)
+    journal.Record('unknown')
+    assert waitFor(lambda: errors)
+
+    config.AddBot(1, 0.0, (0.0, 0.0))
+    journal.Close(discard=True)
+    assert isinstance(errors[0], ValueError)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_failed_save_reaches_callback(tmp_path):
+    journal = ConfigurationJournal(str(tmp_path))
+    journal.Start()
+    done = threading.Event()
+    errors = []
+    journal.SaveAsync(str(tmp_path / 'missing' / 'saved.npy'), [[1, 0.0, (0.0, 0.0)]],
+                      lambda error: (errors.append(error), done.set()))
+    assert done.wait(5.0)
+    journal.Close(discard=True)
+    assert errors[0] is not None
+
+
+def test_corrupt_autosave_raises_and_is_moved_aside(tmp_path):
+    with open(os.path.join(str(tmp_path), 'snapshot.json'), 'w') as snapshot_file:
+        snapshot_file.write('[[1, "north", [0, 0]]]')
+
+    journal = ConfigurationJournal(str(tmp_path))
+    with pytest.raises(ValueError):
+        journal.Recover()
+
+    journal.MoveAside()
+    assert os.listdir(str(tmp_path)) == ['snapshot.json.bad']
+    assert ConfigurationJournal(str(tmp_path)).Recover() is None
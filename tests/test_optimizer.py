@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from core.optimizer import ConfigurationOptimizer, parseObjective
+from core.order_parameters import (OverlapTracker, getOrderParameter, gridOverlapPenalty, overlapPenalty, polarOrder,
+                                   registerOrderParameterScript, unregisterOrderParameter)
+
+
+def test_overlap_tracker_matches_full_penalty():
+    random = np.random.default_rng(0)
+    positions = random.uniform(-20, 20, (80, 2))
+    # stacked bots overlap too
+    positions[:5] = 0
+
+    tracker = OverlapTracker(positions)
+    assert np.isclose(tracker.penalty, overlapPenalty(positions[np.newaxis])[0])
+    assert np.isclose(gridOverlapPenalty(positions), tracker.penalty)
+
+    candidates = np.repeat(positions[np.newaxis], 4, axis=0)
+    moved = np.stack([random.permutation(80)[:7] for _ in range(4)])
+    for batch in range(4):
+        candidates[batch, moved[batch]] += random.normal(0, 3, (7, 2))
+    tracker.ClipMoves(candidates, moved)
+    assert np.allclose(overlapPenalty(candidates) - tracker.penalty, tracker.PenaltyChange(candidates, moved))
+
+
+def test_optimizer_reaches_target_without_overlaps():
+    random = np.random.default_rng(1)
+    bots_positions = [[i, float(random.uniform(0, 360)), tuple(random.uniform(-40, 40, 2)), 'extra']
+                      for i in range(1, 101)]
+
+    optimizer = ConfigurationOptimizer(parseObjective('polar=0.8'), seed=1)
+    optimized, value = optimizer.Run(bots_positions, iterations=2000)
+
+    angles = np.array([[bot[1] for bot in optimized]])
+    positions = np.array([[bot[2] for bot in optimized]])
+    assert value < 1E-4
+    assert abs(polarOrder(angles, positions)[0] - 0.8) < 1E-2
+    assert overlapPenalty(positions)[0] < 1E-3
+    assert [bot[0] for bot in optimized] == [bot[0] for bot in bots_positions]
+    assert all(bot[3] == 'extra' for bot in optimized)
+
+
+@pytest.mark.parametrize('start', ['stacked', 'packed'])
+def test_optimizer_untangles_dense_start(start):
+    random = np.random.default_rng(2)
+    if start == 'stacked':
+        positions = np.zeros((500, 2))
+    else:
+        # about five times denser than bots can be packed
+        positions = random.uniform(0, 30, (500, 2))
+    bots_positions = [[i, 0.0, tuple(position)] for i, position in enumerate(positions)]
+
+    optimizer = ConfigurationOptimizer(parseObjective('polar=0.8'), seed=2)
+    optimized, value = optimizer.Run(bots_positions, iterations=400)
+
+    assert value < 1E-4
+    assert overlapPenalty(np.array([[bot[2] for bot in optimized]]))[0] < 1E-3
+
+
+@pytest.mark.parametrize('text', ['', 'polar', 'bogus=1', 'polar=x'])
+def test_parse_objective_rejects_bad_terms(text):
+    with pytest.raises((ValueError, KeyError)):
+        parseObjective(text)
+
+
+def test_script_with_batch_function_is_usable_in_objective(tmp_path):
+    script = tmp_path / 'spread.py'
+    script.write_text('import numpy as np\n\n'
+                      'def calculateParameterBatch(angles, positions):\n'
+                      '    return positions[..., 0].std(axis=-1)\n\n'
+                      'if __name__ == "__main__":\n'
+                      '    raise SystemExit("should not run on import")\n')
+    plain_script = tmp_path / 'plain.py'
+    plain_script.write_text('def calculateParameter(bots_positions):\n    return 0\n')
+
+    try:
+        assert registerOrderParameterScript('spread', str(script))
+        assert not registerOrderParameterScript('plain', str(plain_script))
+        with pytest.raises(ValueError):
+            registerOrderParameterScript('polar', str(script))
+
+        objective = parseObjective('spread=3')
+        positions = np.array([[[0.0, 0.0], [6.0, 0.0]]])
+        assert np.isclose(objective(np.zeros((1, 2)), positions)[0], 0)
+    finally:
+        unregisterOrderParameter('spread')
+        unregisterOrderParameter('polar')
+
+    with pytest.raises(KeyError):
+        getOrderParameter('spread')
+    getOrderParameter('polar')